@@ -1,38 +1,37 @@
-import os
+import hashlib
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime, timedelta, timezone
 from fastapi import Request, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from dotenv import load_dotenv
-from sqlalchemy.orm import Session
+import jwt
+from jwt import InvalidTokenError as JWTError
+from cachetools import TLRUCache, TTLCache
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached
 import models
+from config import get_settings
+from passwords import hash_password, verify_password, verify_and_update_password  # re-exported
 from database import get_db
 
 # ----------------------------------------------------
-# Load environment variables
+# Authentication settings
 # ----------------------------------------------------
-load_dotenv()
+settings = get_settings()
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
 
-if not SECRET_KEY or not ALGORITHM or not ACCESS_TOKEN_EXPIRE_MINUTES:
-    raise ValueError("Missing authentication configuration in .env")
-
-ACCESS_TOKEN_EXPIRE_MINUTES = int(ACCESS_TOKEN_EXPIRE_MINUTES)
+# Encode the signing key once instead of on every encode/decode
+SECRET_KEY_BYTES = SECRET_KEY.encode()
 
 # ----------------------------------------------------
-# Password hashing context
+# Password hashing
 # ----------------------------------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+# Verified against when a login names an unknown user, so that path costs
+# the same as a wrong password and does not reveal which usernames exist
+DUMMY_HASH = hash_password("not-a-real-password")
 
 # ----------------------------------------------------
 # JWT handling
@@ -41,37 +40,110 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, SECRET_KEY_BYTES, algorithm=ALGORITHM)
 
-def decode_access_token(token: str) -> dict:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+# ----------------------------------------------------
+# Validated token cache
+# ----------------------------------------------------
+JWT_CACHE_MAX_TTL = 60  # seconds
+
+def _token_key(token: str) -> bytes:
+    # Key caches by a digest so raw tokens are never held in memory
+    return hashlib.sha256(token.encode()).digest()
+
+def _jwt_ttu(_key: bytes, payload: dict, now: float) -> float:
+    # An entry never outlives the token's own "exp" claim
+    return min(now + JWT_CACHE_MAX_TTL, payload.get("exp", now + JWT_CACHE_MAX_TTL))
+
+_jwt_cache = TLRUCache(maxsize=10000, ttu=_jwt_ttu, timer=time.time)
+_jwt_cache_lock = threading.Lock()
+
+def decode_access_token(token: str, token_key: bytes | None = None) -> dict:
+    key = token_key or _token_key(token)
+    with _jwt_cache_lock:
+        payload = _jwt_cache.get(key)
+    if payload is not None:
         return payload
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY_BYTES, algorithms=[ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+    # Only successfully validated tokens are cached
+    with _jwt_cache_lock:
+        _jwt_cache[key] = payload
+    return payload
+
+# ----------------------------------------------------
+# Current user cache
+# ----------------------------------------------------
+CachedUser = namedtuple("CachedUser", ["id", "username", "hashed_password", "created_at"])
+
+_user_cache = TTLCache(maxsize=5000, ttl=30)
+_user_cache_lock = threading.Lock()
+
+def _attach_cached_user(db: Session, cached: CachedUser) -> models.User:
+    # Rebuild a session-bound User from the snapshot without emitting a SELECT;
+    # relationships stay unloaded and lazy-load from this session on access.
+    user = models.User(**cached._asdict())
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def evict_cached_user(token: str) -> None:
+    with _user_cache_lock:
+        _user_cache.pop(_token_key(token), None)
+
+def evict_cached_username(username: str) -> None:
+    with _user_cache_lock:
+        stale = [key for key, cached in _user_cache.items() if cached.username == username]
+        for key in stale:
+            _user_cache.pop(key, None)
+
 # ----------------------------------------------------
 # Current user dependency
 # ----------------------------------------------------
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
+# auto_error=False: a cookie alone is enough, so a missing header must not 401
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
 def get_current_user(
     request: Request,
-    token: str = Depends(oauth2_scheme),
+    token: str | None = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
     # Prefer cookie if present
-    cookie_token = request.cookies.get("access_token")
-    if cookie_token:
-        token = cookie_token
+    token = request.cookies.get("access_token") or token
+    if not token:
+        raise HTTPException(
+            status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"}
+        )
 
-    payload = decode_access_token(token)
+    # Hash once and share the key between the token and user caches
+    key = _token_key(token)
+    payload = decode_access_token(token, key)
     username: str = payload.get("sub")
     if username is None:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = db.query(models.User).filter(models.User.username == username).first()
+    with _user_cache_lock:
+        cached = _user_cache.get(key)
+    if cached is not None and cached.username == username:
+        return _attach_cached_user(db, cached)
+
+    # Fetch the one-to-one addresses in the same round-trip as the user
+    user = (
+        db.query(models.User)
+        .options(joinedload(models.User.home_address), joinedload(models.User.work_address))
+        .filter(models.User.username == username)
+        .first()
+    )
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return user
\ No newline at end of file
+    # End the read transaction so async endpoints awaiting I/O hold no pooled
+    # connection; expire_on_commit=False keeps user and addresses loaded
+    db.commit()
+
+    with _user_cache_lock:
+        _user_cache[key] = CachedUser(user.id, user.username, user.hashed_password, user.created_at)
+    return user
@@ -0,0 +1,27 @@
+# benchmark_hashing.py
+# Prints the average verify time for a fixed set of password hashing
+# parameters, to compare against the values configured in passwords.py.
+import time
+from passlib.context import CryptContext
+
+CANDIDATES = {
+    "argon2 t=2 m=19456 p=1": dict(schemes=["argon2"], argon2__type="ID",
+                                   argon2__time_cost=2, argon2__memory_cost=19456, argon2__parallelism=1),
+    "argon2 t=3 m=65536 p=1": dict(schemes=["argon2"], argon2__type="ID",
+                                   argon2__time_cost=3, argon2__memory_cost=65536, argon2__parallelism=1),
+    "bcrypt rounds=10": dict(schemes=["bcrypt"], bcrypt__rounds=10),
+    "bcrypt rounds=12": dict(schemes=["bcrypt"], bcrypt__rounds=12),
+}
+ITERATIONS = 10
+
+
+def time_verify(context: CryptContext) -> float:
+    hashed = context.hash("benchmark-password")
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        context.verify("benchmark-password", hashed)
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+for name, params in CANDIDATES.items():
+    print(f"{name:<26} {time_verify(CryptContext(**params)):8.1f} ms per verify")
@@ -1,12 +1,15 @@
-from database import SessionLocal
-import models
+import os
 
-db = SessionLocal()
+# Wiping the database must be asked for explicitly; check before importing
+# database so a refused run never loads settings or connects
+if os.getenv("ALLOW_WIPE") != "1":
+    raise SystemExit("Refusing to wipe the database; set ALLOW_WIPE=1 to proceed")
 
-# Delete all users
-db.query(models.User).delete()
+from sqlalchemy import text
+from database import engine
 
-# Commit changes
-db.commit()
+# Delete all users and everything that references them in one statement
+with engine.begin() as conn:
+    conn.execute(text("TRUNCATE users, home_addresses, work_addresses, weather_requests RESTART IDENTITY CASCADE"))
 
 print(" All users deleted")
@@ -0,0 +1,29 @@
+# config.py
+from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Application settings, read once from the environment and .env."""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Authentication
+    secret_key: str
+    algorithm: str
+    access_token_expire_minutes: int
+
+    # Database
+    db_user: str
+    db_password: str
+    db_host: str = "localhost"
+    db_port: int = 5432
+    db_name: str
+
+    # Development convenience; production schemas are managed out of band
+    auto_create_tables: bool = False
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
@@ -1,21 +1,16 @@
-import os
 import urllib.parse
-from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from config import get_settings
 
-# Load environment variables from .env
-load_dotenv()
+settings = get_settings()
 
-DATABASE_USER = os.getenv("DB_USER")
-DATABASE_PASSWORD = os.getenv("DB_PASSWORD")
-DATABASE_HOST = os.getenv("DB_HOST", "localhost")
-DATABASE_PORT = os.getenv("DB_PORT", "5432")
-DATABASE_NAME = os.getenv("DB_NAME")
-
-if not all([DATABASE_USER, DATABASE_PASSWORD, DATABASE_NAME]):
-    raise ValueError("Missing database configuration in .env file")
+DATABASE_USER = settings.db_user
+DATABASE_PASSWORD = settings.db_password
+DATABASE_HOST = settings.db_host
+DATABASE_PORT = settings.db_port
+DATABASE_NAME = settings.db_name
 
 # Encode password to handle special characters like @ or :
 encoded_password = urllib.parse.quote_plus(DATABASE_PASSWORD)
@@ -24,11 +19,20 @@ SQLALCHEMY_DATABASE_URL = (
     f"postgresql://{DATABASE_USER}:{encoded_password}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 )
 
-# Create the SQLAlchemy engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Create the SQLAlchemy engine with a pool sized for the threadpool, so
+# requests reuse connections instead of reconnecting and re-authenticating
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=20,
+    max_overflow=40,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    future=True,
+)
 
-# Create a configured "SessionLocal" class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create a configured "SessionLocal" class. Instances stay loaded after
+# commit so handlers can return what they just wrote without a re-SELECT.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
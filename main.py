@@ -1,65 +1,117 @@
-from fastapi import Depends, FastAPI, HTTPException, Body
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from fastapi import Depends, FastAPI, HTTPException, Body, Query, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-import requests
+import httpx
+from cachetools import TTLCache
 
-from database import SessionLocal, engine
+from config import get_settings
+from database import engine, get_db
 import models
-from auth import hash_password, verify_password, create_access_token, get_current_user
+from auth import (
+    DUMMY_HASH, create_access_token, get_current_user,
+    evict_cached_user, evict_cached_username,
+)
+from passwords import hash_password, verify_password, verify_and_update_password
 from schemas import (
-    UserResponse, UserCreate, TokenResponse,
+    UserResponse, UserCreate, TokenResponse, WeatherRequestResponse,
     AddressCreate, AddressUpdate, AddressResponse, AddressesResponse
 )
 
-# Create tables if not already created
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Weather API with DB")
 OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
 
+# Open-Meteo refreshes current conditions every few minutes, so nearby
+# coordinates share one upstream call per minute. Only touched from the
+# event loop, so no lock is needed.
+_weather_cache = TTLCache(maxsize=2048, ttl=60)
 
-# ----------------------------
-# Dependency: DB Session
-# ----------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+async def run_in_password_pool(request: Request, func, *args):
+    pool = request.app.state.password_pool
+    return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables only when asked to (AUTO_CREATE_TABLES=1), once per process
+    # startup rather than on import
+    if get_settings().auto_create_tables:
+        models.Base.metadata.create_all(bind=engine)
+
+    # Shared client so upstream connections (and TLS sessions) are kept alive
+    app.state.http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+    )
+    # Password hashing is CPU-bound; a process pool spreads it over every core
+    # instead of serializing it on threadpool workers. Workers are spawned
+    # rather than forked from a process with a live event loop, threads and
+    # DB connections.
+    app.state.password_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+    )
+    yield
+    await app.state.http_client.aclose()
+    app.state.password_pool.shutdown()
+
+
+app = FastAPI(title="Weather API with DB", lifespan=lifespan)
 
 
 # ----------------------------
 # Weather Endpoints
 # ----------------------------
+def save_weather_request(db: Session, values: dict) -> models.WeatherRequest:
+    # INSERT ... RETURNING hydrates id/timestamp without a follow-up SELECT
+    stmt = insert(models.WeatherRequest).values(**values).returning(models.WeatherRequest)
+    weather_entry = db.scalars(stmt).one()
+    db.commit()
+    return weather_entry
+
+
 @app.get("/weather")
-def get_weather(
+async def get_weather(
+    request: Request,
     latitude: float = 51.5074,
     longitude: float = -0.1278,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Fetch weather from Open-Meteo, save request into DB, and return JSON."""
-    params = {"latitude": latitude, "longitude": longitude, "current_weather": True}
-    response = requests.get(OPEN_METEO_URL, params=params, timeout=10)
-    data = response.json()
+    cache_key = (round(latitude, 2), round(longitude, 2))
+    current = _weather_cache.get(cache_key)
+    if current is None:
+        params = {"latitude": latitude, "longitude": longitude, "current_weather": True}
+        response = await request.app.state.http_client.get(OPEN_METEO_URL, params=params)
+        data = response.json()
 
-    if "current_weather" not in data:
-        raise HTTPException(status_code=400, detail="Weather not available")
+        if "current_weather" not in data:
+            raise HTTPException(status_code=400, detail="Weather not available")
 
-    current = data["current_weather"]
+        current = data["current_weather"]
+        _weather_cache[cache_key] = current
 
-    weather_entry = models.WeatherRequest(
+    values = dict(
         city=f"Lat:{latitude}, Lon:{longitude}",
         latitude=latitude,
         longitude=longitude,
         temperature=current["temperature"],
-        description=f"Windspeed {current['windspeed']} km/h"
+        description=f"Windspeed {current['windspeed']} km/h",
+        user_id=current_user.id,
     )
-    db.add(weather_entry)
-    db.commit()
-    db.refresh(weather_entry)
+    # The session is synchronous; keep its I/O off the event loop
+    weather_entry = await run_in_threadpool(save_weather_request, db, values)
 
     return {
         "user": current_user.username,
@@ -70,38 +122,95 @@ def get_weather(
     }
 
 
-@app.get("/history")
-def get_history(db: Session = Depends(get_db)):
-    """Retrieve all past weather requests."""
-    return db.query(models.WeatherRequest).order_by(models.WeatherRequest.timestamp.desc()).all()
+@app.get("/history", response_model=list[WeatherRequestResponse])
+def get_history(
+    limit: int = Query(50, ge=1, le=500),
+    before: datetime | None = None,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Retrieve the current user's past weather requests, newest first.
+
+    Pass the oldest ``timestamp`` of a page as ``before`` to fetch the next one.
+    """
+    query = (
+        db.query(models.WeatherRequest)
+        .filter(models.WeatherRequest.user_id == current_user.id)
+        .order_by(models.WeatherRequest.timestamp.desc())
+    )
+    if before is not None:
+        query = query.filter(models.WeatherRequest.timestamp < before)
+    return query.limit(limit).all()
 
 
 # ----------------------------
 # Auth Endpoints
 # ----------------------------
-@app.post("/signup", response_model=UserResponse)
-def signup(user: UserCreate = Body(...), db: Session = Depends(get_db)):
-    if db.query(models.User).filter(models.User.username == user.username).first():
+def create_user(db: Session, username: str, hashed_password: str) -> models.User:
+    # The unique index on username enforces uniqueness; no pre-check SELECT.
+    # RETURNING hydrates id/created_at in the same round-trip as the INSERT.
+    stmt = (
+        insert(models.User)
+        .values(username=username, hashed_password=hashed_password)
+        .returning(models.User)
+    )
+    try:
+        new_user = db.scalars(stmt).one()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(status_code=409, detail="Username already exists")
+    return new_user
+
+
+def get_user_by_username(db: Session, username: str) -> models.User | None:
+    user = db.query(models.User).filter(models.User.username == username).first()
+    # End the read transaction so no pooled connection is held while the
+    # caller awaits password hashing; expire_on_commit=False keeps user loaded
+    db.commit()
+    return user
+
 
-    new_user = models.User(username=user.username, hashed_password=hash_password(user.password))
-    db.add(new_user)
+def update_password_hash(db: Session, user: models.User, hashed_password: str) -> None:
+    user.hashed_password = hashed_password
     db.commit()
-    db.refresh(new_user)
+
+
+@app.post("/signup", response_model=UserResponse)
+async def signup(request: Request, user: UserCreate = Body(...), db: Session = Depends(get_db)):
+    hashed_password = await run_in_password_pool(request, hash_password, user.password)
+    new_user = await run_in_threadpool(create_user, db, user.username, hashed_password)
+    # Drop any snapshot left over from a previous account with this username
+    evict_cached_username(new_user.username)
     return new_user
 
 
 @app.post("/login", response_model=TokenResponse)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(
+    request: Request,
+    response: Response,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db),
+):
+    user = await run_in_threadpool(get_user_by_username, db, form_data.username)
+    if not user:
+        await run_in_password_pool(request, verify_password, form_data.password, DUMMY_HASH)
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+
+    verified, new_hash = await run_in_password_pool(
+        request, verify_and_update_password, form_data.password, user.hashed_password
+    )
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
+    # Transparently migrate bcrypt hashes to argon2
+    if new_hash:
+        await run_in_threadpool(update_password_hash, db, user, new_hash)
+
     token = create_access_token(data={"sub": user.username})
 
-    response = JSONResponse(content={"access_token": token, "token_type": "bearer"})
     response.set_cookie(key="access_token", value=token, httponly=True)
-    return response
+    return {"access_token": token, "token_type": "bearer"}
 
 
 @app.get("/me", response_model=UserResponse)
@@ -112,24 +221,26 @@ def read_users_me(current_user: models.User = Depends(get_current_user)):
 # ----------------------------
 # Address Endpoints
 # ----------------------------
+def upsert_address(db: Session, model, user_id: int, fields: dict):
+    """Insert or replace a user's address in one INSERT ... ON CONFLICT statement."""
+    stmt = (
+        insert(model)
+        .values(user_id=user_id, **fields)
+        .on_conflict_do_update(index_elements=["user_id"], set_=fields)
+        .returning(model)
+    )
+    address = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    db.commit()
+    return address
+
+
 @app.post("/home-address", response_model=AddressResponse)
 def add_or_update_home_address(
     address: AddressCreate,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    home = db.query(models.HomeAddress).filter_by(user_id=current_user.id).first()
-    if home:
-        home.street, home.city, home.pincode = address.street, address.city, address.pincode
-        db.commit()
-        db.refresh(home)
-        return home
-
-    new_home = models.HomeAddress(user_id=current_user.id, **address.dict())
-    db.add(new_home)
-    db.commit()
-    db.refresh(new_home)
-    return new_home
+    return upsert_address(db, models.HomeAddress, current_user.id, address.model_dump())
 
 
 @app.put("/home-address", response_model=AddressResponse)
@@ -139,22 +250,22 @@ def update_home_address(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    home = db.query(models.HomeAddress).filter_by(user_id=current_user.id).first()
+    home = current_user.home_address
     if not home:
         raise HTTPException(status_code=404, detail="No home address found")
 
-    if address.street: home.street = address.street
-    if address.city: home.city = address.city
-    if address.pincode: home.pincode = address.pincode
+    # Like the original if-chains, blank and null fields leave the value unchanged
+    for field, value in address.model_dump(exclude_unset=True).items():
+        if value:
+            setattr(home, field, value)
 
     db.commit()
-    db.refresh(home)
     return home
 
 
 @app.delete("/home-address")
 def delete_home_address(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    home = db.query(models.HomeAddress).filter_by(user_id=current_user.id).first()
+    home = current_user.home_address
     if not home:
         raise HTTPException(status_code=404, detail="No home address found")
     db.delete(home)
@@ -170,22 +281,24 @@ def update_work_address(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    work = db.query(models.WorkAddress).filter_by(user_id=current_user.id).first()
+    # Blank and null fields are ignored, as with the original if-chains
+    fields = {field: value for field, value in address.model_dump(exclude_unset=True).items() if value}
+    if fields.keys() == AddressUpdate.model_fields.keys():
+        return upsert_address(db, models.WorkAddress, current_user.id, fields)
+
+    # Partial bodies can only update an existing row
+    work = current_user.work_address
     if not work:
-        work = models.WorkAddress(user_id=current_user.id, **address.dict(exclude_unset=True))
-        db.add(work)
-    else:
-        if address.street: work.street = address.street
-        if address.city: work.city = address.city
-        if address.pincode: work.pincode = address.pincode
+        raise HTTPException(status_code=422, detail="street, city and pincode are required for a new work address")
+    for field, value in fields.items():
+        setattr(work, field, value)
     db.commit()
-    db.refresh(work)
     return work
 
 
 @app.delete("/work-address")
 def delete_work_address(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    work = db.query(models.WorkAddress).filter_by(user_id=current_user.id).first()
+    work = current_user.work_address
     if not work:
         raise HTTPException(status_code=404, detail="No work address found")
     db.delete(work)
@@ -195,8 +308,19 @@ def delete_work_address(current_user: models.User = Depends(get_current_user), d
 
 @app.get("/addresses", response_model=AddressesResponse)
 def get_user_addresses(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    home = db.query(models.HomeAddress).filter_by(user_id=current_user.id).first()
-    work = db.query(models.WorkAddress).filter_by(user_id=current_user.id).first()
+    # One statement whether or not the user came from the token cache; joining
+    # from users keeps a work address even when there is no home address
+    stmt = (
+        select(models.HomeAddress, models.WorkAddress)
+        .select_from(models.User)
+        .outerjoin(models.User.home_address)
+        .outerjoin(models.User.work_address)
+        .where(models.User.id == current_user.id)
+    )
+    row = db.execute(stmt).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    home, work = row
     return {"home_address": home, "work_address": work}
 
 
@@ -204,7 +328,10 @@ def get_user_addresses(current_user: models.User = Depends(get_current_user), db
 # Logout
 # ----------------------------
 @app.post("/logout")
-def logout():
-    response = JSONResponse(content={"message": "Logged out"})
+def logout(request: Request, response: Response):
+    token = request.cookies.get("access_token")
+    if token:
+        evict_cached_user(token)
+
     response.delete_cookie("access_token")
-    return response
\ No newline at end of file
+    return {"message": "Logged out"}
\ No newline at end of file
@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, func
 from database import Base
 from sqlalchemy.orm import relationship
 
@@ -28,11 +28,16 @@ class WeatherRequest(Base):
 
     user = relationship("User", back_populates="weather_requests")
 
+    # Serves /history: per-user rows, newest first
+    __table_args__ = (
+        Index("ix_weather_requests_user_id_timestamp", "user_id", timestamp.desc()),
+    )
+
 class HomeAddress(Base):
     __tablename__ = "home_addresses"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
     street = Column(String, nullable=False)
     city = Column(String, nullable=False)
     pincode = Column(String, nullable=False)
@@ -44,7 +49,7 @@ class WorkAddress(Base):
     __tablename__ = "work_addresses"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True, nullable=False)
     street = Column(String, nullable=False)
     city = Column(String, nullable=False)
     pincode = Column(String, nullable=False)
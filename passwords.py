@@ -0,0 +1,29 @@
+# passwords.py
+# Imports only passlib so process-pool workers that unpickle these functions
+# do not load settings, build a DB engine or recompute auth.DUMMY_HASH.
+from passlib.context import CryptContext
+
+# Argon2id is the default; existing bcrypt hashes still verify and are
+# rehashed to argon2 on the next successful login. The argon2 values are a
+# baseline (19 MiB, 2 passes, 1 lane), not tuned to a latency target; compare
+# candidates on the deployment host with benchmark_hashing.py.
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    default="argon2",
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
+    bcrypt__rounds=10,
+)
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+def verify_and_update_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """Verify a password and return a replacement hash if the stored one is deprecated."""
+    return pwd_context.verify_and_update(password, hashed)
@@ -1,5 +1,6 @@
 # schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
 from datetime import datetime
 
 
@@ -12,8 +13,18 @@ class UserResponse(BaseModel):
     username: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True  # Enable ORM mode
+    model_config = ConfigDict(from_attributes=True)  # Enable ORM mode
+
+class WeatherRequestResponse(BaseModel):
+    id: int
+    city: str
+    latitude: float
+    longitude: float
+    temperature: float
+    description: str
+    timestamp: datetime
+
+    model_config = ConfigDict(from_attributes=True)
 
 class TokenResponse(BaseModel):
     access_token: str
@@ -32,17 +43,16 @@ class AddressCreate(AddressBase):
 
 
 class AddressUpdate(BaseModel):
-    street: str
-    city: str
-    pincode: str
+    street: Optional[str] = None
+    city: Optional[str] = None
+    pincode: Optional[str] = None
 
 
 # Response schema
 class AddressResponse(AddressBase):
     id: int
 
-    class Config:
-        from_attributes = True   # allows ORM → schema conversion
+    model_config = ConfigDict(from_attributes=True)  # allows ORM → schema conversion
 
 class AddressesResponse(BaseModel):
     home_address: AddressResponse | None = None
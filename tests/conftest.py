@@ -0,0 +1,58 @@
+# tests/conftest.py
+# Runs the app against the database configured in .env; tables are created
+# on startup and every test uses fresh usernames.
+import os
+import uuid
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("AUTO_CREATE_TABLES", "1")
+
+import main  # noqa: E402
+from database import engine  # noqa: E402
+
+OPEN_METEO_PAYLOAD = {
+    "current_weather": {"temperature": 12.5, "windspeed": 8.0, "time": "2026-10-14T12:00"}
+}
+
+
+class PoolCheckingClient(TestClient):
+    """TestClient that fails if a request leaves a DB connection checked out."""
+
+    def request(self, *args, **kwargs):
+        response = super().request(*args, **kwargs)
+        checked_out = engine.pool.checkedout()
+        assert checked_out == 0, f"{checked_out} DB connection(s) still checked out after request"
+        return response
+
+
+@pytest.fixture
+def client():
+    with PoolCheckingClient(main.app) as test_client:
+        # Serve Open-Meteo locally instead of going over the network
+        upstream = main.app.state.http_client
+        main.app.state.http_client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json=OPEN_METEO_PAYLOAD))
+        )
+        try:
+            yield test_client
+        finally:
+            mock = main.app.state.http_client
+            main.app.state.http_client = upstream
+            test_client.portal.call(mock.aclose)
+
+
+@pytest.fixture
+def credentials():
+    return {"username": f"user-{uuid.uuid4().hex[:12]}", "password": "s3cret-pass"}
+
+
+@pytest.fixture
+def logged_in(client, credentials):
+    """Sign up and log in; the client keeps the access_token cookie."""
+    assert client.post("/signup", json=credentials).status_code == 200
+    response = client.post("/login", data=credentials)
+    assert response.status_code == 200
+    return response.json()["access_token"]
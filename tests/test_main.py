@@ -0,0 +1,81 @@
+# tests/test_main.py
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_signup_rejects_duplicate_username(client, credentials):
+    response = client.post("/signup", json=credentials)
+    assert response.status_code == 200
+    assert response.json()["username"] == credentials["username"]
+
+    assert client.post("/signup", json=credentials).status_code == 409
+
+
+def test_login_rejects_bad_credentials(client, credentials):
+    client.post("/signup", json=credentials)
+
+    wrong_password = {**credentials, "password": "wrong"}
+    assert client.post("/login", data=wrong_password).status_code == 401
+
+    unknown_user = {**credentials, "username": credentials["username"] + "-missing"}
+    assert client.post("/login", data=unknown_user).status_code == 401
+
+
+def test_me_with_cookie_and_bearer_token(client, credentials, logged_in):
+    # First call loads the user, second is served from the token cache
+    for _ in range(2):
+        response = client.get("/me")
+        assert response.status_code == 200
+        assert response.json()["username"] == credentials["username"]
+
+    # A second client without the cookie jar; used without "with" so it does
+    # not run another lifespan over the shared app.state
+    fresh_client = TestClient(main.app)
+    assert fresh_client.get("/me").status_code == 401
+    response = fresh_client.get("/me", headers={"Authorization": f"Bearer {logged_in}"})
+    assert response.status_code == 200
+
+
+def test_weather_is_recorded_in_history(client, credentials, logged_in):
+    response = client.get("/weather", params={"latitude": 10.0, "longitude": 20.0})
+    assert response.status_code == 200
+    assert response.json() == {
+        "user": credentials["username"],
+        "city": "Lat:10.0, Lon:20.0",
+        "temperature": 12.5,
+        "description": "Windspeed 8.0 km/h",
+        "time": "2026-10-14T12:00",
+    }
+
+    history = client.get("/history", params={"limit": 10}).json()
+    assert [entry["city"] for entry in history] == ["Lat:10.0, Lon:20.0"]
+
+
+def test_address_endpoints(client, logged_in):
+    address = {"street": "1 Main St", "city": "London", "pincode": "E1"}
+
+    assert client.patch("/home-address", json={"city": "Leeds"}).status_code == 404
+    assert client.post("/home-address", json=address).status_code == 200
+
+    # Blank fields are ignored on update
+    response = client.patch("/home-address", json={"street": "", "city": "Leeds"})
+    assert response.json()["street"] == "1 Main St"
+    assert response.json()["city"] == "Leeds"
+
+    assert client.patch("/work-address", json={"city": "Bristol"}).status_code == 422
+    assert client.put("/work-address", json=address).status_code == 200
+
+    addresses = client.get("/addresses").json()
+    assert addresses["home_address"]["city"] == "Leeds"
+    assert addresses["work_address"]["city"] == "London"
+
+    assert client.delete("/home-address").status_code == 200
+    addresses = client.get("/addresses").json()
+    assert addresses["home_address"] is None
+    assert addresses["work_address"]["city"] == "London"
+
+
+def test_logout_clears_cookie(client, logged_in):
+    assert client.post("/logout").status_code == 200
+    assert client.get("/me").status_code == 401